@@ -0,0 +1,221 @@
+import os
+import orjson
+import logging
+import requests
+import mimetypes
+from requests.adapters import HTTPAdapter
+from requests_toolbelt import MultipartEncoder
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger("openwebui_watcher")
+
+
+API_KEY = os.getenv("OPENWEBUI_API_KEY")
+API_URL = os.getenv("OPENWEBUI_API_URL")
+KNOWLEDGE_ID = os.getenv("OPENWEBUI_KNOWLEDGE_ID")
+MAX_CONCURRENT_UPLOADS = int(os.getenv("MAX_CONCURRENT_UPLOADS", "8"))
+
+assert API_KEY and API_URL and KNOWLEDGE_ID, "Set OPENWEBUI_API_KEY, OPENWEBUI_API_URL, OPENWEBUI_KNOWLEDGE_ID in env"
+
+UPLOAD_ENDPOINT = f"{API_URL}/api/v1/files/"
+ADD_FILE_TO_KNOWLEDGE_ENDPOINT = f"{API_URL}/api/v1/knowledge/{KNOWLEDGE_ID}/file/add"
+ADD_FILES_TO_KNOWLEDGE_BATCH_ENDPOINT = f"{API_URL}/api/v1/knowledge/{KNOWLEDGE_ID}/files/batch/add"
+UPDATE_FILE_CONTENT_ENDPOINT_TEMPLATE = f"{API_URL}/api/v1/files/{{file_id}}/data/content/update"
+# Files per batch add request, so one failed request cannot drop a whole initial sync
+KNOWLEDGE_BATCH_SIZE = 50
+# (connect, read) seconds; the read timeout is generous as the server
+# processes an uploaded file before it answers
+REQUEST_TIMEOUT = (10, 300)
+
+# One pooled session for all API calls, so connections are kept alive between requests
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=max(32, MAX_CONCURRENT_UPLOADS),
+    # Only connection failures are retried: every call is a POST, which urllib3
+    # does not retry once sent, and a consumed upload stream cannot be re-sent
+    max_retries=Retry(total=3, backoff_factor=0.3),
+)
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
+SESSION.headers.update({
+    "Authorization": f"Bearer {API_KEY}",
+    "Accept": "application/json"
+})
+
+# Extra headers for knowledge calls, on top of the session ones. Built once
+# and shared; Content-Type comes from json= and keep-alive from the session.
+KNOWLEDGE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:137.0) Gecko/20100101 Firefox/137.0",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Accept-Encoding": "gzip, deflate",
+    "Referer": f"{API_URL}/workspace/knowledge/{KNOWLEDGE_ID}",
+    "Origin": API_URL,
+    "Cookie": f"token={API_KEY}",
+    "Sec-GPC": "1",
+    "Priority": "u=4"
+}
+
+
+class SizedReader:
+    """
+    Reads a file only up to the size it had when opened, so the streamed
+    body always matches the Content-Length the encoder declared, even if
+    the file is still being written.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.len = os.fstat(f.fileno()).st_size
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.len:
+            size = self.len
+        data = self.f.read(size)
+        if size and not data:
+            raise OSError(f"{self.f.name} shrank while being uploaded")
+        self.len -= len(data)
+        return data
+
+
+def upload_file(file_path, upload_filename):
+    logger.info(f"Uploading '{file_path}' as '{upload_filename}'")
+
+    mime_type, _ = mimetypes.guess_type(file_path)
+    if not mime_type:
+        mime_type = "application/octet-stream"
+
+    with open(file_path, "rb") as f:
+        # Streams the file in chunks instead of building the whole body in memory
+        encoder = MultipartEncoder(fields={"file": (upload_filename, SizedReader(f), mime_type)})
+        resp = SESSION.post(
+            UPLOAD_ENDPOINT, data=encoder, headers={"Content-Type": encoder.content_type}, timeout=REQUEST_TIMEOUT
+        )
+
+    resp.raise_for_status()
+    resp_json = resp.json()
+
+    file_id = resp_json.get("id") or resp_json.get("data", {}).get("id")
+    if not file_id:
+        logger.error(f"Failed to get file id from upload response: {resp_json}")
+        return None
+    logger.info(f"Uploaded {file_path} as {upload_filename} with id {file_id}")
+    return file_id
+
+
+# Cleared once the server turns out not to have the batch add endpoint
+batch_add_supported = True
+
+
+def add_file_to_knowledge(file_id):
+    url = ADD_FILE_TO_KNOWLEDGE_ENDPOINT
+    data = {"file_id": file_id}
+
+    resp = SESSION.post(url, headers=KNOWLEDGE_HEADERS, json=data, timeout=REQUEST_TIMEOUT)
+    logger.info("Add to knowledge response code: %s", resp.status_code)
+    # Decoding the body is not free, only do it when it will be logged
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Add to knowledge response content: %s", resp.text)
+    resp.raise_for_status()
+    logger.info(f"Added file {file_id} to knowledge {KNOWLEDGE_ID}")
+    return resp.json()
+
+
+def add_batch_to_knowledge(file_ids):
+    """
+    Adds files to knowledge with a single batch request.
+    Returns the ids that were added, or None if the server has no batch endpoint.
+    """
+    url = ADD_FILES_TO_KNOWLEDGE_BATCH_ENDPOINT
+    data = [{"file_id": file_id} for file_id in file_ids]
+
+    resp = SESSION.post(url, headers=KNOWLEDGE_HEADERS, json=data, timeout=REQUEST_TIMEOUT)
+    logger.info("Batch add to knowledge response code: %s", resp.status_code)
+    if resp.status_code in (404, 405):
+        return None
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Batch add to knowledge response content: %s", resp.text)
+    resp.raise_for_status()
+
+    # A 200 can still list files that failed processing, as "<file_id>: <error>"
+    try:
+        body = resp.json()
+    except ValueError:
+        body = {}
+    warnings = body.get("warnings") if isinstance(body, dict) else None
+    failed = set()
+    for error in (warnings or {}).get("errors") or []:
+        if isinstance(error, dict):
+            failed.add(error.get("file_id"))
+        else:
+            failed.add(str(error).split(":", 1)[0].strip())
+        logger.error(f"Failed to add file to knowledge {KNOWLEDGE_ID}: {error}")
+
+    added = [file_id for file_id in file_ids if file_id not in failed]
+    logger.info(f"Added {len(added)} files to knowledge {KNOWLEDGE_ID}")
+    return added
+
+
+def add_files_to_knowledge(file_ids):
+    """
+    Adds uploaded files to knowledge, KNOWLEDGE_BATCH_SIZE per request.
+    Falls back to one request per file on servers without the batch endpoint.
+    Returns the ids that were added; a failed request only loses its own ids.
+    """
+    global batch_add_supported
+
+    added = []
+    for start in range(0, len(file_ids), KNOWLEDGE_BATCH_SIZE):
+        chunk = file_ids[start:start + KNOWLEDGE_BATCH_SIZE]
+
+        if batch_add_supported:
+            try:
+                chunk_added = add_batch_to_knowledge(chunk)
+            except Exception as e:
+                logger.error(f"Failed to add {len(chunk)} files to knowledge {KNOWLEDGE_ID}: {e}")
+                continue
+            if chunk_added is not None:
+                added.extend(chunk_added)
+                continue
+            logger.info("Batch add endpoint not available, adding files one by one")
+            batch_add_supported = False
+
+        for file_id in chunk:
+            try:
+                add_file_to_knowledge(file_id)
+                added.append(file_id)
+            except Exception as e:
+                logger.error(f"Failed to add file {file_id} to knowledge {KNOWLEDGE_ID}: {e}")
+    return added
+
+
+def update_file_content(file_id, file_path):
+    url = UPDATE_FILE_CONTENT_ENDPOINT_TEMPLATE.format(file_id=file_id)
+
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            content = f.read()
+    except UnicodeDecodeError:
+        # Could not decode as text, fallback to binary update is not possible via this API
+        logger.error(f"Failed to read file {file_path} as UTF-8 text for content update; skipping update")
+        return False
+    except Exception as e:
+        logger.error(f"Failed to read file {file_path} for content update: {e}")
+        return False
+
+    data = orjson.dumps({"content": content})
+    # Only the encoded body needs to stay in memory during the request
+    del content
+
+    logger.info(f"Updating content for file id {file_id} from {file_path}")
+    resp = SESSION.post(url, data=data, headers={"Content-Type": "application/json"}, timeout=REQUEST_TIMEOUT)
+    logger.info("Update content response code: %s", resp.status_code)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Update content response content: %s", resp.text)
+    try:
+        resp.raise_for_status()
+        logger.info(f"Successfully updated content for file id {file_id}")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to update content for file id {file_id}: {e}")
+        return False
@@ -0,0 +1,72 @@
+import os
+import orjson
+import logging
+
+UPLOAD_DB_FILE = ".upload.json"
+# Records changed since UPLOAD_DB_FILE was last written, one JSON line each
+UPLOAD_JOURNAL_FILE = ".upload.jsonl"
+
+logger = logging.getLogger("openwebui_watcher")
+
+
+def is_upload_db_file(file_path):
+    return os.path.basename(file_path) in (UPLOAD_DB_FILE, UPLOAD_JOURNAL_FILE, UPLOAD_DB_FILE + ".tmp")
+
+
+def load_upload_db():
+    db = {}
+    if os.path.exists(UPLOAD_DB_FILE):
+        try:
+            with open(UPLOAD_DB_FILE, "rb") as f:
+                db = orjson.loads(f.read())
+        except Exception as e:
+            logger.error(f"Failed to load upload database {UPLOAD_DB_FILE}: {e}")
+            return {}
+
+    if os.path.exists(UPLOAD_JOURNAL_FILE):
+        try:
+            with open(UPLOAD_JOURNAL_FILE, "rb") as f:
+                for line in f:
+                    file_path, record = orjson.loads(line)
+                    db[file_path] = record
+        except ValueError:
+            # A crash mid-append leaves a truncated last line; everything before it is good
+            logger.warning(f"Ignoring truncated entry in {UPLOAD_JOURNAL_FILE}")
+        except Exception as e:
+            logger.error(f"Failed to load upload journal {UPLOAD_JOURNAL_FILE}: {e}")
+    return db
+
+
+def append_upload_records(records):
+    """
+    Appends changed records to the journal, O(1) per record.
+    save_upload_db later folds them into UPLOAD_DB_FILE.
+    """
+    try:
+        with open(UPLOAD_JOURNAL_FILE, "ab") as f:
+            f.write(b"".join(orjson.dumps([file_path, record]) + b"\n" for file_path, record in records.items()))
+    except Exception as e:
+        logger.error(f"Failed to append to upload journal {UPLOAD_JOURNAL_FILE}: {e}")
+
+
+def save_upload_db(db):
+    tmp_file = UPLOAD_DB_FILE + ".tmp"
+    try:
+        with open(tmp_file, "wb") as f:
+            f.write(orjson.dumps(db))
+        os.replace(tmp_file, UPLOAD_DB_FILE)
+        # The snapshot now holds every journaled record
+        if os.path.exists(UPLOAD_JOURNAL_FILE):
+            os.remove(UPLOAD_JOURNAL_FILE)
+    except Exception as e:
+        logger.error(f"Failed to save upload database {UPLOAD_DB_FILE}: {e}")
+
+
+def build_basename_index(upload_db):
+    """
+    Returns a dict mapping each basename in upload_db to the set of its paths.
+    """
+    basename_index = {}
+    for path in upload_db:
+        basename_index.setdefault(os.path.basename(path), set()).add(path)
+    return basename_index
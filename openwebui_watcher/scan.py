@@ -0,0 +1,442 @@
+import os
+import time
+import queue
+import logging
+import threading
+import pathspec
+import xxhash
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
+
+from .api import KNOWLEDGE_ID, MAX_CONCURRENT_UPLOADS, add_files_to_knowledge, update_file_content, upload_file
+from .db import (
+    UPLOAD_JOURNAL_FILE,
+    append_upload_records,
+    build_basename_index,
+    is_upload_db_file,
+    load_upload_db,
+    save_upload_db,
+)
+
+# Bytes hashed per read; reused buffer, so memory stays flat for large files
+HASH_CHUNK_SIZE = 1 << 20
+# Filesystems where kernel change notifications miss remote writes
+NETWORK_FS_TYPES = {"nfs", "nfs4", "cifs", "smbfs", "smb3", "sshfs", "9p"}
+
+logger = logging.getLogger("openwebui_watcher")
+
+
+ALLOWED_FILE_EXTENSIONS = os.getenv("ALLOWED_FILE_EXTENSIONS", "")
+
+if ALLOWED_FILE_EXTENSIONS:
+    ALLOWED_EXTS = set(ext.strip().lower() for ext in ALLOWED_FILE_EXTENSIONS.split(",") if ext.strip())
+else:
+    ALLOWED_EXTS = None
+
+# Picked once here rather than checking ALLOWED_EXTS on every file
+if ALLOWED_EXTS is None:
+    def has_allowed_extension(file_path):
+        return True
+else:
+    def has_allowed_extension(file_path):
+        # Same rules as os.path.splitext: the extension is the text after the
+        # last dot of the basename, and leading dots alone do not make one
+        stem, dot, ext = os.path.basename(file_path).rpartition(".")
+        return bool(dot) and bool(stem.strip(".")) and ext.lower() in ALLOWED_EXTS
+
+
+def build_upload_filename(file_path, root_dir, basename_index):
+    """
+    Returns upload filename.
+    Uses plain filename if unique in basename_index,
+    otherwise prefixes immediate parent directory with __.
+    """
+    abs_root = os.path.abspath(root_dir)
+    abs_file = os.path.abspath(file_path)
+    rel_path = os.path.relpath(abs_file, abs_root)
+    filename = os.path.basename(file_path)
+
+    # Check for duplicates
+    duplicates = basename_index.get(filename, set()) - {abs_file}
+
+    if not duplicates:
+        return filename
+    else:
+        parts = rel_path.split(os.sep)
+        if len(parts) >= 2:
+            parent_folder = parts[-2]
+            return f"{parent_folder}__{filename}"
+        else:
+            return filename
+
+
+def load_gitignore_patterns(scan_dir):
+    gitignore_path = os.path.join(scan_dir, ".gitignore")
+    if os.path.exists(gitignore_path):
+        with open(gitignore_path, "r") as f:
+            patterns = f.read().splitlines()
+        return pathspec.PathSpec.from_lines("gitwildmatch", patterns)
+    return None
+
+
+def is_network_filesystem(path):
+    """
+    Returns True if path lives on a network mount (NFS, SMB, ...),
+    where inotify does not see changes made by other hosts.
+    """
+    real_path = os.path.realpath(path)
+    best_mount, best_fstype = "", ""
+    try:
+        with open("/proc/mounts", "r") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace("\\040", " ")
+                if mount_point != "/" and not (real_path == mount_point or real_path.startswith(mount_point + os.sep)):
+                    continue
+                if len(mount_point) >= len(best_mount):
+                    best_mount, best_fstype = mount_point, fields[2]
+    except OSError:
+        return False
+    return best_fstype.split(".")[-1] in NETWORK_FS_TYPES
+
+
+def should_sync(file_path, scan_dir, gitignore_spec):
+    # Cheapest check first, most files are usually filtered out here
+    if not has_allowed_extension(file_path):
+        return False
+
+    # Saving the database must not trigger another sync
+    if is_upload_db_file(file_path):
+        return False
+
+    # Check if file is ignored by gitignore
+    if gitignore_spec and gitignore_spec.match_file(os.path.relpath(file_path, scan_dir)):
+        logger.info(f"Skipping ignored file: {file_path}")
+        return False
+
+    return True
+
+
+def scan_files(path, scan_dir, gitignore_spec):
+    """
+    Recursively yields (file_path, stat_result) for files under path that should be synced.
+    Uses os.scandir so each file costs a single stat call.
+    """
+    try:
+        # Read the whole directory up front so no fd stays open while recursing
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError as e:
+        logger.error(f"Failed to list directory {path}: {e}")
+        return
+
+    for entry in entries:
+        try:
+            if entry.is_dir():
+                # Like os.walk, do not descend into symlinked directories
+                if not entry.is_symlink():
+                    yield from scan_files(entry.path, scan_dir, gitignore_spec)
+                continue
+        except OSError:
+            continue
+
+        if not should_sync(entry.path, scan_dir, gitignore_spec):
+            continue
+        try:
+            st = entry.stat()
+        except OSError as e:
+            logger.error(f"Failed to get mtime for {entry.path}: {e}")
+            continue
+        yield entry.path, st
+
+
+def hash_file(file_path):
+    """
+    Returns the xxh64 digest of the file content, for change detection only.
+    """
+    h = xxhash.xxh64()
+    buf = bytearray(HASH_CHUNK_SIZE)
+    view = memoryview(buf)
+    # Plain reads rather than mmap: a file truncated while mapped kills the process with SIGBUS
+    with open(file_path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.intdigest()
+
+
+def push_file(file_path, st, record, upload_filename):
+    """
+    Updates the content of an already uploaded file, or uploads it.
+    Skips both if the content did not change since record was written.
+    Returns the new upload_db record, or None.
+    A record with a new file_id still has to be added to knowledge.
+    """
+    try:
+        digest = hash_file(file_path)
+        state = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "xxh64": digest}
+
+        if record and record.get("size") == st.st_size and record.get("xxh64") == digest:
+            # Touched but not modified: remember the new mtime, skip the upload
+            return dict(state, file_id=record["file_id"])
+
+        if record and "file_id" in record:
+            # Update existing file content
+            if update_file_content(record["file_id"], file_path):
+                return dict(state, file_id=record["file_id"])
+            # On failure fallback to reupload
+
+        # New file: upload, adding to knowledge is batched by the caller
+        file_id = upload_file(file_path, upload_filename)
+        if file_id:
+            return dict(state, file_id=file_id)
+    except Exception as e:
+        logger.error(f"Error updating or uploading {file_path}: {e}")
+    return None
+
+
+def record_pushed(pushed, scheduled, upload_db, basename_index):
+    """
+    Adds newly uploaded files among pushed to knowledge and records them in upload_db.
+    Unindexes scheduled paths that ended up without a record.
+    Returns the records of synced files.
+    """
+    # Add every newly uploaded file to knowledge in one request
+    new_ids = {
+        record["file_id"]: file_path for file_path, record in pushed.items()
+        if record["file_id"] != upload_db.get(file_path, {}).get("file_id")
+    }
+    if new_ids:
+        try:
+            added = set(add_files_to_knowledge(list(new_ids)))
+        except Exception as e:
+            logger.error(f"Failed to add files to knowledge {KNOWLEDGE_ID}: {e}")
+            added = set()
+        for file_id, file_path in new_ids.items():
+            if file_id not in added:
+                del pushed[file_path]
+
+    # Only this thread touches upload_db, tasks just return their records
+    synced = {}
+    for file_path, record in pushed.items():
+        upload_db[file_path] = synced[file_path] = record
+    for file_path in scheduled:
+        if file_path not in upload_db:
+            basename_index[os.path.basename(file_path)].discard(file_path)
+    return synced
+
+
+def sync_files(files, scan_dir, upload_db, basename_index, executor):
+    """
+    Pushes the files among (file_path, stat_result) pairs that changed since
+    the last sync concurrently on executor.
+    Mutates upload_db and basename_index in place and returns the records of synced files.
+    If interrupted, files already pushed are still recorded before re-raising.
+    """
+    futures = {}
+    pushed = {}
+    try:
+        for file_path, st in files:
+            record = upload_db.get(file_path)
+            # Unchanged file; records from older versions only have a float mtime
+            if record and (
+                record.get("mtime_ns") == st.st_mtime_ns
+                or ("mtime_ns" not in record and record.get("mtime") == st.st_mtime)
+            ):
+                continue
+
+            # Names are picked here, in order, and scheduled files are indexed
+            # right away so files sharing a basename in one batch stay distinct
+            upload_filename = build_upload_filename(file_path, scan_dir, basename_index)
+            basename_index.setdefault(os.path.basename(file_path), set()).add(file_path)
+            # Hashing runs in the task too, so reading one file overlaps with sending another
+            future = executor.submit(push_file, file_path, st, record, upload_filename)
+            futures[future] = file_path
+
+        for future in as_completed(futures):
+            record = future.result()
+            if record:
+                pushed[futures[future]] = record
+    except BaseException:
+        # Drop queued tasks, let running ones finish, and keep every file that
+        # reached the server so it is not uploaded again as a duplicate
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        for future, file_path in futures.items():
+            if not future.cancelled() and future.exception() is None and future.result():
+                pushed[file_path] = future.result()
+        record_pushed(pushed, futures.values(), upload_db, basename_index)
+        raise
+
+    return record_pushed(pushed, futures.values(), upload_db, basename_index)
+
+
+class FileChangeHandler(FileSystemEventHandler):
+    """
+    Queues files the observer reports as created, modified or moved into place.
+    A worker thread syncs them in batches, coalescing events that arrive within
+    debounce seconds, and saves upload_db at most once per save_period seconds.
+    """
+
+    def __init__(self, scan_dir, upload_db, gitignore_spec, save_period=30, debounce=2):
+        super().__init__()
+        self.scan_dir = scan_dir
+        self.upload_db = upload_db
+        self.basename_index = build_basename_index(upload_db)
+        self.gitignore_spec = gitignore_spec
+        self.save_period = save_period
+        self.debounce = debounce
+        self._queue = queue.Queue()
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_UPLOADS)
+        self._worker = threading.Thread(target=self._run, name="openwebui-watcher-sync", daemon=True)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._queue.put(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._queue.put(event.src_path)
+
+    def on_moved(self, event):
+        # Editors often save by writing a temp file and renaming it over the original
+        if not event.is_directory:
+            self._queue.put(event.dest_path)
+
+    def sync_paths(self, paths):
+        files = []
+        for path in paths:
+            file_path = os.path.abspath(os.fsdecode(path))
+            if not should_sync(file_path, self.scan_dir, self.gitignore_spec):
+                continue
+            try:
+                st = os.stat(file_path)
+            except FileNotFoundError:
+                # Editors create and delete temp files on every save; gone by now
+                logger.debug("Skipping vanished file: %s", file_path)
+                continue
+            except Exception as e:
+                logger.error(f"Failed to get mtime for {file_path}: {e}")
+                continue
+            files.append((file_path, st))
+        self.sync(files)
+
+    def sync(self, files):
+        try:
+            synced = sync_files(files, self.scan_dir, self.upload_db, self.basename_index, self._executor)
+        except BaseException:
+            # sync_files recorded what it finished before re-raising; close() saves it
+            self._dirty = True
+            raise
+        if synced:
+            append_upload_records(synced)
+            self._dirty = True
+
+    def flush(self):
+        if self._dirty:
+            save_upload_db(self.upload_db)
+            self._dirty = False
+        self._last_save = time.monotonic()
+
+    def start(self):
+        self._worker.start()
+
+    def close(self):
+        if self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join()
+        self.flush()
+        self._executor.shutdown()
+
+    def _run(self):
+        while True:
+            timeout = None
+            if self._dirty:
+                timeout = self._last_save + self.save_period - time.monotonic()
+                if timeout <= 0:
+                    self.flush()
+                    timeout = None
+            try:
+                path = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self.flush()
+                continue
+            if path is None:
+                return
+
+            # Collect the rest of the burst; a dict dedupes paths but keeps arrival order
+            paths = {path: None}
+            stopping = False
+            deadline = time.monotonic() + self.debounce
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    path = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if path is None:
+                    stopping = True
+                    break
+                paths[path] = None
+
+            self.sync_paths(paths)
+            if stopping:
+                return
+
+
+def scan_and_sync(scan_dir=".", sleep_period=30):
+    if ALLOWED_EXTS is None:
+        logger.info("No ALLOWED_FILE_EXTENSIONS set, will upload all file types.")
+    else:
+        logger.info(f"Will upload only files with these extensions: {sorted(ALLOWED_EXTS)}")
+
+    upload_db = load_upload_db()
+    if os.path.exists(UPLOAD_JOURNAL_FILE):
+        # Fold the previous run's journal into the snapshot before appending to it again
+        save_upload_db(upload_db)
+    gitignore_spec = load_gitignore_patterns(scan_dir)
+    handler = FileChangeHandler(scan_dir, upload_db, gitignore_spec, save_period=sleep_period)
+
+    if is_network_filesystem(scan_dir):
+        logger.info(f"{scan_dir} is on a network filesystem, polling every {sleep_period}s")
+        observer = PollingObserver(timeout=sleep_period)
+    else:
+        observer = Observer()
+    observer.schedule(handler, scan_dir, recursive=True)
+    # Start watching before the initial sync so changes made during it are queued, not missed
+    try:
+        observer.start()
+    except OSError as e:
+        # Large trees can exceed fs.inotify.max_user_watches
+        logger.warning(f"Could not watch {scan_dir} for changes ({e}), polling every {sleep_period}s instead")
+        observer = PollingObserver(timeout=sleep_period)
+        observer.schedule(handler, scan_dir, recursive=True)
+        observer.start()
+
+    try:
+        # Catch up on changes made while the watcher was not running
+        logger.info("Starting initial sync")
+        handler.sync(scan_files(os.path.abspath(scan_dir), scan_dir, gitignore_spec))
+        handler.flush()
+
+        handler.start()
+        logger.info("Watching for changes")
+        while observer.is_alive():
+            observer.join(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        observer.stop()
+        observer.join()
+        handler.close()